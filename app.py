@@ -1,11 +1,12 @@
 import io
 import datetime
+import functools
 import textwrap
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import streamlit as st
-import streamlit_authenticator as stauth
+import xlsxwriter
 
 
 # ----------------------------
@@ -92,50 +93,120 @@ def lisa_report_box(title: str, text: str, bg1: str, bg2: str, border: str):
 
 
 def parse_sales_summary(s_df: pd.DataFrame) -> dict[str, float]:
-    out = {}
-    for _, row in s_df.iterrows():
-        k = str(row.iloc[0]).strip()
-        v = row.iloc[1] if len(row) > 1 else None
-        if k and k != "nan" and pd.notna(v):
-            try:
-                out[k] = float(v)
-            except Exception:
-                pass
-    return out
+    if s_df.shape[1] < 2:
+        return {}
+    keys = s_df.iloc[:, 0].fillna("").astype(str).str.strip()
+    vals = pd.to_numeric(s_df.iloc[:, 1], errors="coerce")
+    mask = keys.ne("") & keys.ne("nan") & vals.notna()
+    return dict(zip(keys[mask].tolist(), vals[mask].astype(float).tolist()))
+
+
+EXPENSE_COLUMNS = ["Category", "Vendor", "Date", "Amount"]
 
 
 def parse_expenses(exp_df: pd.DataFrame) -> pd.DataFrame:
-    expenses_list = []
-    curr_cat = None
+    if exp_df.shape[1] < 4:
+        return pd.DataFrame(columns=EXPENSE_COLUMNS)
+
+    raw0 = exp_df.iloc[:, 0]
+    col0 = raw0.fillna("").astype(str).str.strip()
+
+    # rows that can be a category header or an expense line (not blanks, titles, totals or "Vendor")
+    candidate = (
+        col0.ne("")
+        & col0.ne("nan")
+        & col0.ne("Vendor")
+        & col0.ne("Total")
+        & ~col0.str.contains("Report", regex=False)
+        & ~col0.str.contains("Total Expenses", regex=False)
+    )
+    # a category header is the row right above a "Vendor" row; carry it down to its lines
+    is_header = candidate & col0.shift(-1).eq("Vendor")
+    if not is_header.any():
+        return pd.DataFrame(columns=EXPENSE_COLUMNS)
+    category = col0.where(is_header).ffill()
+
+    # only parse dates/amounts on possible expense lines that have a date;
+    # mixed-format date parsing is per element, so skipping blanks and headers pays off
+    line = candidate & ~is_header & category.notna() & exp_df.iloc[:, 2].notna()
+    dates = pd.to_datetime(exp_df.iloc[:, 2][line], errors="coerce", format="mixed")
+    raw_amounts = exp_df.iloc[:, 3][line]
+    amounts = pd.to_numeric(raw_amounts.astype(str).str.replace(r"[$,]", "", regex=True), errors="coerce")
+
+    # a blank amount stays in as NaN (sums as 0, so its category still gets a row);
+    # only text that isn't a number drops the line
+    keep = (dates.notna() & (amounts.notna() | raw_amounts.isna())).to_numpy()
+    # build straight from typed arrays; few distinct labels, so the text
+    # columns are categoricals (groupbys work on integer codes, not strings)
+    df = pd.DataFrame(
+        {
+            "Category": pd.Categorical(category[line].to_numpy()[keep]),
+            "Vendor": pd.Categorical(raw0[line].to_numpy()[keep]),
+            "Date": dates.to_numpy()[keep],
+            "Amount": amounts.to_numpy(dtype=float)[keep],
+        }
+    )
+    # stable sort keeps each category's rows in sheet order
+    return df.sort_values("Category", kind="mergesort").reset_index(drop=True)
+
 
-    for i, row in exp_df.iterrows():
-        c0 = str(row.iloc[0]).strip()
+def read_upload(file_bytes: bytes, name: str) -> pd.DataFrame:
+    if name.lower().endswith(".csv"):
+        try:
+            # pyarrow (ships with streamlit) parses multithreaded in C++
+            return pd.read_csv(io.BytesIO(file_bytes), header=None, engine="pyarrow")
+        except pd.errors.ParserError:
+            # it rejects ragged rows that the C parser just pads with NaN
+            return pd.read_csv(io.BytesIO(file_bytes), header=None)
+    # calamine (Rust) reads both .xlsx and .xls, much faster than openpyxl
+    return pd.read_excel(io.BytesIO(file_bytes), header=None, engine="calamine")
 
-        if c0 == "Total" or "Total Expenses" in c0:
-            continue
 
-        if c0 and c0 != "nan" and c0 != "Vendor" and "Report" not in c0:
-            if i + 1 < len(exp_df) and str(exp_df.iloc[i + 1, 0]) == "Vendor":
-                curr_cat = c0
-            elif curr_cat:
-                try:
-                    date_val = pd.to_datetime(row.iloc[2], errors="coerce")
-                    amount_val = float(str(row.iloc[3]).replace(",", "").replace("$", ""))
-                    if pd.notna(date_val):
-                        expenses_list.append(
-                            {"Category": curr_cat, "Vendor": row.iloc[0], "Date": date_val, "Amount": amount_val}
-                        )
-                except Exception:
-                    pass
+# Streamlit reruns the whole script on every widget change, so key the
+# read + parse on the uploaded bytes and only redo it for a new file
+@st.cache_data(show_spinner=False)
+def load_and_parse_sales(file_bytes: bytes, name: str) -> dict[str, float]:
+    return parse_sales_summary(read_upload(file_bytes, name))
 
-    return pd.DataFrame(expenses_list)
+
+@st.cache_data(show_spinner=False)
+def load_and_parse_expenses(file_bytes: bytes, name: str) -> pd.DataFrame:
+    return parse_expenses(read_upload(file_bytes, name))
+
+
+# report box rules (42/17/12 wide columns)
+REPORT_TITLE = f"{' ' * 20}PROFIT & LOSS STATEMENT - All Year\n"
+REPORT_TOP = f"╔{'═'*42}╦{'═'*17}╦{'═'*12}╗\n"
+REPORT_MID = f"╠{'═'*42}╬{'═'*17}╬{'═'*12}╣\n"
+REPORT_SEP = f"╠{'─'*42}╬{'─'*17}╬{'─'*12}╣\n"
+REPORT_BOTTOM = f"╚{'═'*42}╩{'═'*17}╩{'═'*12}╝\n"
 
 
 def format_line(desc, amount, pct=""):
     return f"║ {desc:<40} ║ {amount:>15} ║ {pct:>10} ║\n"
 
 
-def build_report_and_tables(sales_summary, expenses_df, include_tips: bool):
+REPORT_HEADER = format_line("DESCRIPTION", "AMOUNT ($)", "% OF REV")
+
+# P&L rows are (kind, desc, amount, pct); every kind gets its own line template.
+# Header rows carry NaN amounts, so their template only uses the description;
+# sep rows are a fixed rule and ignore the row entirely.
+REPORT_LINES = {
+    "header": ("║ {0:<40} ║" + " " * 17 + "║" + " " * 12 + "║\n").format,
+    "sep": lambda *_: REPORT_SEP,
+    "data": "║ {:<40} ║ {:>15,.2f} ║ {:>10.1%} ║\n".format,
+}
+
+
+def expense_totals(expenses_df: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    if expenses_df is None or expenses_df.empty:
+        return pd.Series(dtype=float), pd.Series(dtype=float)
+    vendor_totals = expenses_df.groupby("Vendor", sort=False, observed=True)["Amount"].sum()
+    category_totals = expenses_df.groupby("Category", observed=True)["Amount"].sum()
+    return vendor_totals, category_totals
+
+
+def build_report_and_tables(sales_summary, category_totals: pd.Series, include_tips: bool):
     net_sales = sales_summary.get("Net Sales", 0.0)
     gratuity = sales_summary.get("Gratuity", 0.0)
     tax_collected = sales_summary.get("Tax", 0.0)
@@ -144,79 +215,89 @@ def build_report_and_tables(sales_summary, expenses_df, include_tips: bool):
     total_rev = net_sales + tax_collected + prepayments
     if include_tips:
         total_rev += gratuity
+    inv_rev = (1.0 / total_rev) if total_rev else 0.0
 
     cogs_cats = ["Back Bar", "Inventory"]
-    cogs_df = expenses_df[expenses_df["Category"].isin(cogs_cats)] if not expenses_df.empty else expenses_df
-    opex_df = expenses_df[~expenses_df["Category"].isin(cogs_cats)] if not expenses_df.empty else expenses_df
+    cogs_totals = category_totals.reindex(cogs_cats, fill_value=0.0)
+    opex_totals = category_totals.drop(cogs_cats, errors="ignore")
 
     processing_fees = abs(sales_summary.get("Payment Processing Fees Paid By Business", 0.0))
     sales_tax_expense = tax_collected
 
-    total_cogs = float(cogs_df["Amount"].sum()) if not cogs_df.empty else 0.0
+    total_cogs = float(cogs_totals.sum())
     gross_margin = float(total_rev - total_cogs)
-    total_opex = float((opex_df["Amount"].sum() if not opex_df.empty else 0.0) + processing_fees + sales_tax_expense)
+    total_opex = float(opex_totals.sum() + processing_fees + sales_tax_expense)
     net_profit = float(gross_margin - total_opex)
 
-    last_pnl_data = [
-        ["REVENUE", "", ""],
-        ["  Net Sales", net_sales, (net_sales / total_rev) if total_rev else 0],
-        ["  Tax Collected", tax_collected, (tax_collected / total_rev) if total_rev else 0],
-        ["  Prepayments", prepayments, (prepayments / total_rev) if total_rev else 0],
+    # rows are (kind, desc, amount); only "data" rows have an amount
+    rows = [
+        ("header", "REVENUE", np.nan),
+        ("data", "  Net Sales", net_sales),
+        ("data", "  Tax Collected", tax_collected),
+        ("data", "  Prepayments", prepayments),
     ]
     if include_tips:
-        last_pnl_data.append(["  Tips/Gratuity", gratuity, (gratuity / total_rev) if total_rev else 0])
+        rows.append(("data", "  Tips/Gratuity", gratuity))
 
-    last_pnl_data.append(["TOTAL REVENUE", total_rev, 1.0])
-    last_pnl_data.append(["", "", ""])
-    last_pnl_data.append(["COGS", "", ""])
+    rows.append(("data", "TOTAL REVENUE", total_rev))
+    rows.append(("sep", "", np.nan))
+    rows.append(("header", "COGS", np.nan))
 
-    for cat in cogs_cats:
-        amt = float(cogs_df[cogs_df["Category"] == cat]["Amount"].sum()) if not cogs_df.empty else 0.0
+    for cat, amt in cogs_totals.items():
+        amt = float(amt)
         if amt > 0:
-            last_pnl_data.append([f"  {cat}", amt, (amt / total_rev) if total_rev else 0])
+            rows.append(("data", f"  {cat}", amt))
 
-    last_pnl_data.extend(
+    rows.extend(
         [
-            ["TOTAL COGS", total_cogs, (total_cogs / total_rev) if total_rev else 0],
-            ["GROSS MARGIN", gross_margin, (gross_margin / total_rev) if total_rev else 0],
-            ["", "", ""],
-            ["OPERATING EXPENSES", "", ""],
-            ["  Sales Tax Paid Out", sales_tax_expense, (sales_tax_expense / total_rev) if total_rev else 0],
-            ["  Processing Fees", processing_fees, (processing_fees / total_rev) if total_rev else 0],
+            ("data", "TOTAL COGS", total_cogs),
+            ("data", "GROSS MARGIN", gross_margin),
+            ("sep", "", np.nan),
+            ("header", "OPERATING EXPENSES", np.nan),
+            ("data", "  Sales Tax Paid Out", sales_tax_expense),
+            ("data", "  Processing Fees", processing_fees),
         ]
     )
 
-    if not opex_df.empty:
-        cat_totals = opex_df.groupby("Category")["Amount"].sum().sort_values(ascending=False)
-        for cat, amt in cat_totals.items():
-            amt = float(amt)
-            last_pnl_data.append([f"  {cat}", amt, (amt / total_rev) if total_rev else 0])
+    for cat, amt in opex_totals.sort_values(ascending=False).items():
+        rows.append(("data", f"  {cat}", float(amt)))
 
-    last_pnl_data.extend(
+    rows.extend(
         [
-            ["TOTAL OPEX", total_opex, (total_opex / total_rev) if total_rev else 0],
-            ["NET PROFIT", net_profit, (net_profit / total_rev) if total_rev else 0],
+            ("data", "TOTAL OPEX", total_opex),
+            ("data", "NET PROFIT", net_profit),
         ]
     )
 
-    rep = f"{' ' * 20}PROFIT & LOSS STATEMENT - All Year\n"
-    rep += f"╔{'═'*42}╦{'═'*17}╦{'═'*12}╗\n"
-    rep += format_line("DESCRIPTION", "AMOUNT ($)", "% OF REV")
-    rep += f"╠{'═'*42}╬{'═'*17}╬{'═'*12}╣\n"
+    pnl_df = pd.DataFrame(rows, columns=["Kind", "Description", "Amount"])
+    pnl_df["Pct"] = pnl_df["Amount"] * inv_rev
 
-    for row in last_pnl_data:
-        if row[0] and not row[1] and not row[2]:
-            rep += f"║ {row[0]:<40} ║ {'':>15} ║ {'':>10} ║\n"
-        elif not row[0]:
-            rep += f"╠{'─'*42}╬{'─'*17}╬{'─'*12}╣\n"
-        else:
-            rep += format_line(row[0], f"{row[1]:,.2f}", f"{(row[2]*100):.1f}%")
+    body = [REPORT_LINES[kind](desc, amount, pct) for kind, desc, amount, pct in pnl_df.itertuples(index=False, name=None)]
+    rep = "".join([REPORT_TITLE, REPORT_TOP, REPORT_HEADER, REPORT_MID, *body, REPORT_BOTTOM])
+    return rep, pnl_df, net_profit
 
-    rep += f"╚{'═'*42}╩{'═'*17}╩{'═'*12}╝\n"
-    return rep, last_pnl_data, net_profit
 
+# a couple dozen rows go straight to xlsxwriter, streamed row by row
+def pnl_excel_bytes(pnl_df: pd.DataFrame) -> bytes:
+    export = pnl_df[["Description", "Amount", "Pct"]]
+    export = export.astype(object).where(export.notna(), None)  # NaN -> blank cell
+    excel_bytes = io.BytesIO()
+    workbook = xlsxwriter.Workbook(excel_bytes, {"constant_memory": True})
+    sheet = workbook.add_worksheet("P&L Report")
+    header_fmt = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+    sheet.write_row(0, 0, ["Description", "Amount ($)", "% of Total"], header_fmt)
+    for r, row in enumerate(export.itertuples(index=False, name=None), start=1):
+        sheet.write_row(r, 0, row)
+    workbook.close()
+    return excel_bytes.getvalue()
 
-def calc_hanover_tax_text(net: float, fed_income_rate: float, local_eit_rate: float):
+
+TAX_HEADER = "ESTIMATED TAX LIABILITY (HANOVER, PA)\n" + "=" * 50 + "\n"
+
+
+# pure in its inputs; the timestamp is stamped on outside the cache
+@functools.lru_cache(maxsize=64)
+def hanover_tax_body(net: float, fed_income_rate: float, local_eit_rate: float):
     se_tax = (net * 0.9235) * 0.153
     fed_inc = max(0, net - (se_tax * 0.5)) * (fed_income_rate / 100)
     pa_state = net * 0.0307
@@ -224,39 +305,47 @@ def calc_hanover_tax_text(net: float, fed_income_rate: float, local_eit_rate: fl
     lst = 52.0 if net > 12000 else 0
     total_tax = se_tax + fed_inc + pa_state + pa_local + lst
 
-    txt = (
-        "ESTIMATED TAX LIABILITY (HANOVER, PA)\n"
-        + "=" * 50
-        + "\n"
-        + f"Report Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        + f"Business Profit:  ${net:,.2f}\n"
-        + f"{'-' * 50}\n"
-        + f"Fed SE Tax (15.3%):               ${se_tax:,.2f}\n"
-        + f"Fed Income Tax ({fed_income_rate}%):           ${fed_inc:,.2f}\n"
-        + f"PA State Tax (3.07%):             ${pa_state:,.2f}\n"
-        + f"Hanover Local EIT ({local_eit_rate}%):          ${pa_local:,.2f}\n"
-        + f"PA Local Services Tax (LST):      ${lst:,.2f}\n"
-        + "=" * 50
-        + "\n"
-        + f"TOTAL ESTIMATED TAX DUE:          ${total_tax:,.2f}\n"
-        + f"ESTIMATED TAKE-HOME:              ${net - total_tax:,.2f}\n"
+    body = "".join(
+        [
+            f"Business Profit:  ${net:,.2f}\n",
+            f"{'-' * 50}\n",
+            f"Fed SE Tax (15.3%):               ${se_tax:,.2f}\n",
+            f"Fed Income Tax ({fed_income_rate}%):           ${fed_inc:,.2f}\n",
+            f"PA State Tax (3.07%):             ${pa_state:,.2f}\n",
+            f"Hanover Local EIT ({local_eit_rate}%):          ${pa_local:,.2f}\n",
+            f"PA Local Services Tax (LST):      ${lst:,.2f}\n",
+            "=" * 50 + "\n",
+            f"TOTAL ESTIMATED TAX DUE:          ${total_tax:,.2f}\n",
+            f"ESTIMATED TAKE-HOME:              ${net - total_tax:,.2f}\n",
+        ]
     )
-    return txt, total_tax
+    return body, total_tax
+
+
+def calc_hanover_tax_text(net: float, fed_income_rate: float, local_eit_rate: float):
+    body, total_tax = hanover_tax_body(net, fed_income_rate, local_eit_rate)
+    stamp = f"Report Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+    return "".join([TAX_HEADER, stamp, body]), total_tax
+
 
+def draw_charts(vendor_totals: pd.Series, expense_breakdown: pd.Series):
+    # matplotlib is slow to import and only the charts tab needs it. A bare
+    # Figure skips pyplot's figure manager/backend canvas and global registry,
+    # so it is freed as soon as the PNG is written.
+    from matplotlib.figure import Figure
 
-def draw_charts(expenses_df: pd.DataFrame):
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
+    fig = Figure(figsize=(12, 6))
+    ax1, ax2 = fig.subplots(1, 2)
     fig.patch.set_facecolor(COLORS["light_bg"])
 
-    if expenses_df is not None and not expenses_df.empty:
-        top_v = expenses_df.groupby("Vendor")["Amount"].sum().sort_values(ascending=False).head(5)
+    if not expense_breakdown.empty:
+        top_v = vendor_totals.nlargest(5)
         wrapped_labels = [textwrap.fill(str(label), width=15) for label in top_v.index]
         top_v.plot(kind="bar", ax=ax1, color=[COLORS["pink"], COLORS["purple"], COLORS["blue"], COLORS["yellow"], COLORS["teal"]])
         ax1.set_xticklabels(wrapped_labels, rotation=30, ha="right")
         ax1.set_title("Top 5 Vendor Spend")
         ax1.set_facecolor(COLORS["report_bg"])
 
-        expense_breakdown = expenses_df.groupby("Category")["Amount"].sum()
         pie_colors = [COLORS["pink"], COLORS["purple"], COLORS["blue"], COLORS["yellow"], COLORS["green"], COLORS["red"]]
         colors_for_pie = [pie_colors[i % len(pie_colors)] for i in range(len(expense_breakdown))]
         pie_labels = [textwrap.fill(str(label), width=20) for label in expense_breakdown.index]
@@ -266,16 +355,31 @@ def draw_charts(expenses_df: pd.DataFrame):
         ax1.text(0.5, 0.5, "No expense data available", ha="center", va="center", transform=ax1.transAxes)
         ax2.text(0.5, 0.5, "No expense data available", ha="center", va="center", transform=ax2.transAxes)
 
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
 
+# cached on the totals: the charts are only redrawn when the numbers change.
+# Cache the PNG, not the Figure: figures are mutable and not thread-safe, so
+# one can't be shared across sessions, and bytes are cheap to keep around.
+@st.cache_data(show_spinner=False, max_entries=32)
+def chart_png(vendor_totals: pd.Series, expense_breakdown: pd.Series) -> bytes:
+    buf = io.BytesIO()
+    # same output st.pyplot produces
+    draw_charts(vendor_totals, expense_breakdown).savefig(buf, format="png", dpi=200, bbox_inches="tight")
+    return buf.getvalue()
+
+
 # ----------------------------
 # Page + style
 # ----------------------------
 st.set_page_config(page_title="Custom Lash Therapy Suite", layout="wide")
-st.markdown(
-    f"""
+
+
+# COLORS never changes, so build the stylesheet once and reuse it across reruns
+@st.cache_data
+def theme_css() -> str:
+    return f"""
     <style>
 
     /* 🌈 App background */
@@ -349,9 +453,10 @@ st.markdown(
     }}
 
     </style>
-    """,
-    unsafe_allow_html=True
-)
+    """
+
+
+st.markdown(theme_css(), unsafe_allow_html=True)
 
 
 
@@ -359,6 +464,7 @@ st.markdown(
 # Login (2 users) from st.secrets
 # ----------------------------
 # Secrets come from Streamlit Cloud Secrets UI (recommended) or local .streamlit/secrets.toml
+# import streamlit_authenticator as stauth
 # creds = st.secrets["auth"]["credentials"]
 # cookie_name = st.secrets["auth"]["cookie"]["name"]
 # cookie_key = st.secrets["auth"]["cookie"]["key"]
@@ -387,14 +493,20 @@ st.markdown(
 # ----------------------------
 # Session state (keeps you and her separate)
 # ----------------------------
-if "sales_df" not in st.session_state:
-    st.session_state.sales_df = None
-if "exp_df_raw" not in st.session_state:
-    st.session_state.exp_df_raw = None
+if "sales_summary" not in st.session_state:
+    st.session_state.sales_summary = None
+if "expenses_df" not in st.session_state:
+    st.session_state.expenses_df = None
+if "vendor_totals" not in st.session_state:
+    st.session_state.vendor_totals = None
+if "category_totals" not in st.session_state:
+    st.session_state.category_totals = None
 if "report_text" not in st.session_state:
     st.session_state.report_text = ""
-if "last_pnl_data" not in st.session_state:
-    st.session_state.last_pnl_data = []
+if "last_pnl_df" not in st.session_state:
+    st.session_state.last_pnl_df = None
+if "pnl_xlsx" not in st.session_state:
+    st.session_state.pnl_xlsx = None
 if "net_profit" not in st.session_state:
     st.session_state.net_profit = 0.0
 if "tax_text" not in st.session_state:
@@ -430,26 +542,23 @@ with tab1:
             if sales_file is None or exp_file is None:
                 st.error("Load both files first!")
             else:
-                # read
-                if sales_file.name.lower().endswith(".csv"):
-                    s_df = pd.read_csv(sales_file, header=None)
-                else:
-                    s_df = pd.read_excel(sales_file, header=None)
+                # read + parse (cached on file contents)
+                sales_summary = load_and_parse_sales(sales_file.getvalue(), sales_file.name)
+                expenses_df = load_and_parse_expenses(exp_file.getvalue(), exp_file.name)
 
-                if exp_file.name.lower().endswith(".csv"):
-                    e_df_raw = pd.read_csv(exp_file, header=None)
-                else:
-                    e_df_raw = pd.read_excel(exp_file, header=None)
+                # one groupby per key, shared by the report and the charts tab
+                vendor_totals, category_totals = expense_totals(expenses_df)
 
-                st.session_state.sales_df = s_df
-                st.session_state.exp_df_raw = e_df_raw
+                st.session_state.sales_summary = sales_summary
+                st.session_state.expenses_df = expenses_df
+                st.session_state.vendor_totals = vendor_totals
+                st.session_state.category_totals = category_totals
 
-                sales_summary = parse_sales_summary(s_df)
-                expenses_df = parse_expenses(e_df_raw)
-
-                report_text, last_pnl_data, net_profit = build_report_and_tables(sales_summary, expenses_df, include_tips)
+                report_text, last_pnl_df, net_profit = build_report_and_tables(sales_summary, category_totals, include_tips)
                 st.session_state.report_text = report_text
-                st.session_state.last_pnl_data = last_pnl_data
+                st.session_state.last_pnl_df = last_pnl_df
+                # build the export once here; reruns just hand the stored bytes to the button
+                st.session_state.pnl_xlsx = pnl_excel_bytes(last_pnl_df)
                 st.session_state.net_profit = net_profit
 
                 # update tax too (default rates)
@@ -461,16 +570,10 @@ with tab1:
                 st.success("Report generated!")
 
     with cB:
-        if st.session_state.last_pnl_data:
-            df_export = pd.DataFrame(st.session_state.last_pnl_data, columns=["Description", "Amount ($)", "% of Total"])
-            excel_bytes = io.BytesIO()
-            with pd.ExcelWriter(excel_bytes, engine="openpyxl") as writer:
-                df_export.to_excel(writer, index=False, sheet_name="P&L Report")
-            excel_bytes.seek(0)
-
+        if st.session_state.pnl_xlsx is not None:
             st.download_button(
                 "DOWNLOAD TO EXCEL",
-                data=excel_bytes.getvalue(),
+                data=st.session_state.pnl_xlsx,
                 file_name=f"Pnl_Report_{datetime.date.today().isoformat()}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True,
@@ -479,16 +582,15 @@ with tab1:
             st.button("DOWNLOAD TO EXCEL", disabled=True, use_container_width=True)
 
     st.subheader("Report")
-    st.code(st.session_state.report_text or "Load files and click GENERATE REPORT...", language="text")
+    st.code(st.session_state.report_text or "Load files and click GENERATE REPORT...", language=None)
 
 with tab2:
     st.subheader("Charts & Analytics")
-    if st.session_state.exp_df_raw is None:
+    if st.session_state.expenses_df is None:
         st.info("Generate a report first to load expense data.")
     else:
-        expenses_df = parse_expenses(st.session_state.exp_df_raw)
-        fig = draw_charts(expenses_df)
-        st.pyplot(fig, clear_figure=True)
+        png = chart_png(st.session_state.vendor_totals, st.session_state.category_totals)
+        st.image(png, use_container_width=True)
 
 with tab3:
     st.subheader("Tax Estimator")
@@ -507,7 +609,7 @@ with tab3:
         st.session_state.tax_text = tax_txt
         st.success("Tax recalculated!")
 
-    st.code(st.session_state.tax_text or "Generate a P&L report to populate net profit, then recalculate taxes.", language="text")
+    st.code(st.session_state.tax_text or "Generate a P&L report to populate net profit, then recalculate taxes.", language=None)
 
     # Download button (unchanged)
     if st.session_state.get("tax_text"):